@@ -29,25 +29,370 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 '''
 
 # built-in modules
+import collections
 import datetime as dt
+import itertools
 import logging
+import queue
 import time
-import yaml
 
 # third-party modules
 import threading
-import pandas as pd
-import zmq.green as zmq
+import numpy as np
+import zmq
 
 # customized modules
 import datafeed.engine  as dEngine
 import ctpmd
 import ctpUtil
+try:
+    # compiled tick parser, built from ctpParse.pyx
+    from ctpParse import parseBatch
+    _parserError = None
+except ImportError as e:
+    from ctpUtil import parseBatch
+    _parserError = e
 
 # customize logging configure
 logging.basicConfig( format='[%(levelname)s] %(message)s',
         level=logging.DEBUG )
 
+if _parserError is None:
+    logging.info( 'Using the compiled ctpParse tick parser.' )
+else:
+    logging.info( 'Using the pure Python tick parser, ctpParse is not available: {e:s}.'.format(
+            e=str( _parserError ) ) )
+
+
+class Tick( collections.namedtuple( 'Tick', 'secId tradeDate price' ) ):
+    '''A single market data tick received from the CTP bridge.
+
+Attributes
+----------
+secId : str
+    securities identifier;
+tradeDate : datetime.datetime
+    trade timestamp of the tick;
+price : float
+    last price.
+    '''
+    __slots__ = ()
+
+    def toFrame( self ):
+        '''Materialize the tick as a one-row pandas.DataFrame indexed by secId.
+
+Returns
+-------
+df : pandas.DataFrame
+    the tick in the legacy DataFrame layout.
+        '''
+        # pandas is only loaded once a DataFrame is actually needed
+        import pandas as pd
+
+        return pd.DataFrame( { 'tradeDate': [ self.tradeDate ],
+                               'price': [ self.price ] },
+                index=pd.Index( [ self.secId ], name='secId' ) )
+
+
+class TickBatch( collections.namedtuple( 'TickBatch', 'secIds tradeDates prices' ) ):
+    '''A batch of market data ticks kept as parallel columns.
+
+Attributes
+----------
+secIds : numpy.ndarray of object
+    securities identifiers;
+tradeDates : numpy.ndarray of datetime64[ns]
+    trade timestamps of the ticks;
+prices : numpy.ndarray of float64
+    last prices.
+    '''
+    __slots__ = ()
+
+    def toFrame( self ):
+        '''Materialize the batch as a pandas.DataFrame indexed by secId.
+
+Returns
+-------
+df : pandas.DataFrame
+    the ticks in the legacy DataFrame layout.
+        '''
+        import pandas as pd
+
+        return pd.DataFrame( { 'tradeDate': self.tradeDates,
+                               'price': self.prices },
+                index=pd.Index( self.secIds, name='secId' ) )
+
+
+class LazyFrame( object ):
+    '''The pandas.DataFrame of a Tick or a TickBatch, built on first use.
+
+One instance is shared by all the subscribers receiving the same ticks, so
+the DataFrame is built at most once, on the first worker thread asking for
+it, instead of on the receiver thread.
+    '''
+    __slots__ = ( 'data', 'frame', 'lock' )
+
+    def __init__( self, data ):
+        '''Initialize the materializer.
+
+Parameters
+----------
+data : Tick or TickBatch
+    the ticks to materialize.
+        '''
+        self.data  = data
+        self.frame = None
+        self.lock  = threading.Lock()
+
+
+    def get( self ):
+        '''Get the DataFrame of the ticks.
+
+Returns
+-------
+df : pandas.DataFrame
+    the ticks in the legacy DataFrame layout.
+        '''
+        frame = self.frame
+        if frame is None:
+            with self.lock:
+                frame = self.frame
+                if frame is None:
+                    frame = self.frame = self.data.toFrame()
+        return frame
+
+
+class SubscriberWorker( object ):
+    '''Deliver data to one subscriber on its own thread.
+
+The receiver thread only pushes callbacks into a bounded queue, so a slow
+subscriber cannot stall the market data ingestion. When the queue is full,
+the data are dropped for that subscriber; the first drop is logged, then a
+summary at most every DROP_LOG_INTERVAL seconds.
+    '''
+    # minimum seconds between two drop summaries of the same subscriber
+    DROP_LOG_INTERVAL = 10.0
+
+    def __init__( self, subscriber, maxSize ):
+        '''Initialize the worker and start its delivery thread.
+
+Parameters
+----------
+subscriber : datafeed.subscriber.Subscriber
+    the subscriber to deliver data to;
+maxSize : int
+    maximum number of pending deliveries.
+        '''
+        self.subscriber = subscriber
+        self.queue  = queue.Queue( maxSize )
+
+        # data dropped in total and since the last drop log
+        self.dropped = 0
+        self.droppedSinceLog = 0
+        self.lastDropLog = None
+
+        # set once the worker is asked to stop
+        self.stopped = False
+
+        self.thread = threading.Thread( target=self.run, daemon=True )
+        self.thread.start()
+
+
+    def push( self, callback, data ):
+        '''Queue the data for delivery without blocking.
+
+Parameters
+----------
+callback : callable
+    the subscriber callback to invoke;
+data : object
+    data passed to the callback, a LazyFrame is materialized on the
+    delivery thread first.
+        '''
+        if self.stopped:
+            return
+
+        try:
+            self.queue.put_nowait( ( callback, data ) )
+        except queue.Full:
+            self.dropped += 1
+            self.droppedSinceLog += 1
+            now = time.monotonic()
+            if self.lastDropLog is None or now - self.lastDropLog >= self.DROP_LOG_INTERVAL:
+                logging.warning( 'Queue of subscriber {s!r} is full, dropped {n:d} data '
+                        '({t:d} in total).'.format( s=self.subscriber,
+                        n=self.droppedSinceLog, t=self.dropped ) )
+                self.droppedSinceLog = 0
+                self.lastDropLog = now
+
+
+    def stop( self ):
+        '''Stop the delivery thread without blocking, pending data are discarded.
+        '''
+        self.stopped = True
+        try:
+            # wake the delivery thread up if it waits on an empty queue,
+            # a full queue means it is busy and sees the flag on its next item
+            self.queue.put_nowait( None )
+        except queue.Full:
+            pass
+
+
+    def run( self ):
+        '''Deliver the queued data until stopped.
+        '''
+        get = self.queue.get
+        while True:
+            item = get()
+            if item is None or self.stopped:
+                break
+
+            callback, data = item
+            try:
+                if isinstance( data, LazyFrame ):
+                    data = data.get()
+                callback( data )
+            except Exception:
+                logging.exception( 'Subscriber failed to process data.' )
+
+        # release whatever is still queued, including data pushed while stopping
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+class TickRing( object ):
+    '''A fixed-capacity ring buffer holding the latest ticks.
+
+The ticks are written in place into preallocated columns, so keeping the
+recent history costs no allocation in the steady state. Subscribers read
+the latest rows at their own cadence through snapshot().
+
+The ring has a single writer, the receiver thread, and readers do not lock
+it: like a seqlock the writer announces the ticks it is about to write
+before writing them, and readers drop the rows that may have been
+overwritten while they were copied.
+    '''
+    def __init__( self, size ):
+        '''Initialize the ring buffer.
+
+Parameters
+----------
+size : int
+    number of ticks kept.
+        '''
+        self.size = size
+        self.secIds     = np.empty( size, dtype=object )
+        self.tradeDates = np.empty( size, dtype='M8[ns]' )
+        self.prices     = np.empty( size, dtype=np.float64 )
+
+        # total number of ticks ever written, the next slot is head % size
+        self.head = 0
+        # total number of ticks written or being written, never behind head
+        self.reserved = 0
+
+
+    def append( self, secId, tradeDate, price ):
+        '''Write a single tick.
+
+Parameters
+----------
+secId : str
+    securities identifier;
+tradeDate : datetime.datetime or numpy.datetime64
+    trade timestamp;
+price : float
+    last price.
+        '''
+        head = self.head
+        self.reserved = head + 1
+        i = head % self.size
+        self.secIds[ i ]     = secId
+        self.tradeDates[ i ] = tradeDate
+        self.prices[ i ]     = price
+        self.head = head + 1
+
+
+    def extend( self, secIds, tradeDates, prices ):
+        '''Write a batch of ticks given as parallel columns.
+
+Parameters
+----------
+secIds : list or numpy.ndarray of str
+    securities identifiers;
+tradeDates : list or numpy.ndarray of datetime
+    trade timestamps;
+prices : list or numpy.ndarray of float
+    last prices.
+        '''
+        size = self.size
+        n    = len( prices )
+        head = self.head
+        if n > size:
+            # only the latest ticks fit
+            head += n - size
+            secIds, tradeDates, prices = secIds[ -size : ], tradeDates[ -size : ], \
+                    prices[ -size : ]
+            n = size
+
+        self.reserved = head + n
+        start = head % size
+        k     = min( n, size - start )
+        for col, values in ( ( self.secIds, secIds ), ( self.tradeDates, tradeDates ),
+                             ( self.prices, prices ) ):
+            col[ start : start + k ] = values[ : k ]
+            if k < n:
+                col[ : n - k ] = values[ k : ]
+
+        self.head = head + n
+
+
+    def snapshot( self, n=None ):
+        '''Get the latest ticks as a pandas.DataFrame indexed by secId.
+
+The rows are copied out of the ring, so the result is not affected by
+later writes. Rows overwritten by the writer while being copied are
+dropped, so fewer rows than requested may be returned when the ring is
+written faster than it is read.
+
+Parameters
+----------
+n : int
+    number of latest ticks to get, all the ticks kept by default.
+
+Returns
+-------
+df : pandas.DataFrame
+    the latest ticks, oldest first.
+        '''
+        import pandas as pd
+
+        head  = self.head
+        size  = self.size
+        count = min( head, size ) if n is None else min( n, head, size )
+        start = ( head - count ) % size
+
+        if start + count <= size:
+            secIds, tradeDates, prices = ( col[ start : start + count ].copy()
+                    for col in ( self.secIds, self.tradeDates, self.prices ) )
+        else:
+            end = start + count - size
+            secIds, tradeDates, prices = (
+                    np.concatenate( ( col[ start : ], col[ : end ] ) )
+                    for col in ( self.secIds, self.tradeDates, self.prices ) )
+
+        # the ticks before reserved - size may have been overwritten meanwhile
+        stale = self.reserved - size - ( head - count )
+        if stale > 0:
+            secIds, tradeDates, prices = secIds[ stale : ], tradeDates[ stale : ], \
+                    prices[ stale : ]
+
+        return pd.DataFrame( { 'tradeDate': tradeDates, 'price': prices },
+                index=pd.Index( secIds, name='secId', copy=False ), copy=False )
+
+
 class CTPDataPublisher( dEngine.DataPublisher ):
     '''Data publisher engine for CTP.
     '''
@@ -75,18 +420,37 @@ raise
 * FileNotFoundError when the given YAML file is not found;
 * KeyError if the required fileds are not specified in the configure file.
         '''
-        with open( configPath, 'r' ) as f:
-            self.config = yaml.load( f.read() )
+        self.config = ctpUtil.loadConfig( configPath )
         # initialize the subscriber dict
         self.subscribers = {}
 
         # mapping from CTP securities ID's to external names
         self.secIds = {}
-        # mapping from instrument to concerned
+        # the same mapping keyed by the raw bytes received from the bridge
+        self.rawSecIds = {}
+        # mapping from instrument to concerned subscribers, each value is a
+        # frozenset replaced on write
         self.topicsToSubscribers = {}
 
-        # next identifier for the subscriber
-        self.nextId = 1
+        # delivery worker of each subscriber
+        self.workers = {}
+        self.queueSize = self.config.get( 'SUBSCRIBER_QUEUE_SIZE', 10000 )
+
+        # optional ring buffer of the latest ticks shared with subscribers
+        ringSize = self.config.get( 'TICK_RING_SIZE' )
+        self.tickRing = TickRing( ringSize ) if ringSize else None
+
+        # identifier generator for the subscribers
+        self.idGen = itertools.count( 1 )
+
+        # market data receiver socket on the process-wide context shared with
+        # other engines, the receiver thread only polls it
+        self.ctx  = zmq.Context.instance()
+        ioThreads = self.config.get( 'MQ_IO_THREADS' )
+        if ioThreads is not None:
+            # only effective before the first socket of the context is created
+            self.ctx.set( zmq.IO_THREADS, ioThreads )
+        self.sock = self.ctx.socket( zmq.SUB )
 
         ctpmd.login( self.config[ 'MD_FRONT_IP' ], self.config[ 'BROKER_ID' ],
                 self.config[ 'INVESTOR_ID' ], self.config[ 'PASSWORD' ] )
@@ -110,6 +474,7 @@ endDate : datetime.date
             # In case the passed in symbols are securities ID's.
             ctpTopics = dict( ( ctpUtil.getCtpInstId( tt ), tt ) for tt in t )
             self.secIds.update( ctpTopics )
+            self.rawSecIds.update( ( k.encode( 'ascii' ), v ) for k, v in ctpTopics.items() )
             if not ( f is None or fields is None ):
                 fields.update( f )
             else:
@@ -151,20 +516,21 @@ subscriberId : int
     Identifier of the subscriber.
         '''
         if subscriber is not None:
-            subId = self.nextId
-            self.nextId += 1
+            subId = next( self.idGen )
 
             self.subscribers[ subId ] = subscriber
+            if subscriber not in self.workers:
+                self.workers[ subscriber ] = SubscriberWorker( subscriber,
+                        self.queueSize )
 
-            # add the subscriber to the topics to subscribers mapping
+            # add the subscriber to the topics to subscribers mapping,
+            # the receiver thread reads the frozen snapshots without locking
             subscribedTopics = subscriber.getSubscribedTopics()
             for topic in subscribedTopics:
-                if topic not in self.topicsToSubscribers:
-                    self.topicsToSubscribers[ topic ] = set()
-
                 logging.debug( 'Add subscriber {sid:d} to topic {t:s}.'.format(
                         sid=subId, t=topic ) )
-                self.topicsToSubscribers[ topic ].add( subscriber )
+                self.topicsToSubscribers[ topic ] = self.topicsToSubscribers.get(
+                        topic, frozenset() ) | { subscriber, }
         else:
             subId = None
 
@@ -199,7 +565,12 @@ raise Exception when error occurs.
                 for topic in subscribedTopics:
                     logging.debug( 'Remove subscriber {sid:d} from topic list {t:s}.'.format(
                             sid=subscriberId, t=topic ) )
-                    self.topicsToSubscribers[ topic ] -= { subscriber, }
+                    self.topicsToSubscribers[ topic ] = self.topicsToSubscribers.get(
+                            topic, frozenset() ) - { subscriber, }
+
+                # stop delivering unless it is still registered under another ID
+                if subscriber not in self.subscribers.values():
+                    self.workers.pop( subscriber ).stop()
 
             return subscriber
 
@@ -223,7 +594,8 @@ Exceptions
 raise Exception when error occurs.
         '''
         if subscriberId in self.subscribers:
-            self.subscribers[ subscriberId ].onData( data )
+            subscriber = self.subscribers[ subscriberId ]
+            self.workers[ subscriber ].push( subscriber.onData, data )
         else:
             raise Exception( 'Subscriber with ID {sid:d} does not exist.'.format(
                     sid=subscriberId ) )
@@ -232,57 +604,205 @@ raise Exception when error occurs.
     def notifyAll( self, data ):
         '''Notify all subscribers with the given data.
 
+Subscribers setting the attribute wantsRawTick to True receive the Tick or
+TickBatch as is through onTick; the others receive a pandas.DataFrame
+through onData, which is materialized at most once per call on the worker
+thread of the first subscriber delivering it. A batch of several securities
+is split so that each subscriber only receives the rows of its topics. The
+callbacks run on the worker thread of each subscriber.
+
 Parameters
 ----------
-data : object
-    data feed to all the subscribers.
+data : Tick, TickBatch or pandas.DataFrame
+    data feed to all the subscribers, either a single tick, a batch of
+    ticks or a DataFrame indexed by secId.
 
 Exceptions
 ----------
 raise Exception when error occurs.
         '''
-        # find all the subscribers that care about the datafeed.
-        secIds = set( data.index )
-        subscribers = set()
-        for secId in secIds:
-            subscribers = subscribers.union( self.topicsToSubscribers.get( secId, set() ) )
+        # keep the latest ticks for subscribers reading the ring buffer
+        tickRing = self.tickRing
+        if tickRing is not None:
+            if isinstance( data, Tick ):
+                tickRing.append( *data )
+            elif isinstance( data, TickBatch ):
+                tickRing.extend( *data )
+
+        # find all the subscribers that care about the datafeed together with
+        # the rows of their topics, single securities data go straight to the
+        # topic subscribers.
+        topicsToSubscribers = self.topicsToSubscribers
+        if isinstance( data, Tick ):
+            subscriberData = { s: data for s in topicsToSubscribers.get( data.secId, () ) }
+        else:
+            secIds = data.secIds if isinstance( data, TickBatch ) else data.index
+            if len( secIds ) == 1:
+                subscriberData = { s: data for s in topicsToSubscribers.get( secIds[ 0 ], () ) }
+            else:
+                subscriberData = self._splitBatch( data, secIds )
+
+        workers = self.workers
+        frames  = {}
+        for s, d in subscriberData.items():
+            worker = workers.get( s )
+            if worker is None:
+                # removed in the meantime
+                continue
+
+            isRaw = isinstance( d, ( Tick, TickBatch ) )
+            if isRaw and getattr( s, 'wantsRawTick', False ):
+                worker.push( s.onTick, d )
+            else:
+                # subscribers of the same rows share one DataFrame, built on
+                # the first worker thread delivering it
+                df = frames.get( id( d ) )
+                if df is None:
+                    df = frames[ id( d ) ] = LazyFrame( d ) if isRaw else d
+                worker.push( s.onData, df )
+
+
+    def _splitBatch( self, data, secIds ):
+        '''Split a batch of several securities by the topics of each subscriber.
+
+Parameters
+----------
+data : TickBatch or pandas.DataFrame
+    batch of ticks;
+secIds : sequence of str
+    securities identifier of each row in the batch.
 
-        if len( subscribers ) > 0:
-            for s in subscribers:
-                s.onData( data )
+Returns
+-------
+subscriberData : dict
+    rows of the batch concerned by each subscriber, in the order received,
+    subscribers of the same rows share the same object.
+        '''
+        # group the rows by securities once
+        rows = {}
+        for i, secId in enumerate( secIds ):
+            idx = rows.get( secId )
+            if idx is None:
+                rows[ secId ] = [ i ]
+            else:
+                idx.append( i )
+
+        topicsToSubscribers = self.topicsToSubscribers
+        subscriberRows = {}
+        for secId, idx in rows.items():
+            for s in topicsToSubscribers.get( secId, () ):
+                sRows = subscriberRows.get( s )
+                if sRows is None:
+                    subscriberRows[ s ] = list( idx )
+                else:
+                    sRows.extend( idx )
+
+        n = len( secIds )
+        slices = {}
+        subscriberData = {}
+        for s, idx in subscriberRows.items():
+            if len( idx ) == n:
+                subscriberData[ s ] = data
+                continue
+
+            idx.sort()
+            key = tuple( idx )
+            d = slices.get( key )
+            if d is None:
+                if isinstance( data, TickBatch ):
+                    d = TickBatch( data.secIds[ idx ], data.tradeDates[ idx ],
+                            data.prices[ idx ] )
+                else:
+                    d = data.iloc[ idx ]
+                slices[ key ] = d
+            subscriberData[ s ] = d
+
+        return subscriberData
 
 
     def receiveDatafeed( self, topics ):
         '''Receive datafeed from the data publisher.
 
+Messages already queued on the socket are drained into a batch of at most
+BATCH_MAX ticks or BATCH_US microseconds, and the batch is delivered to the
+subscribers in one go as a Tick or a TickBatch.
+
 Parameters
 ----------
 topics : list of str
     topics that the receiver concerns.
         '''
-        ctx  = zmq.Context()
-        sock = ctx.socket( zmq.SUB )
-        # add concerned topics
-        for topic in topics:
-            sock.setsockopt_string( zmq.SUBSCRIBE, topic )
+        sock = self.sock
+        # a deeper queue and kernel buffer absorb tick bursts without drops
+        sock.set_hwm( self.config.get( 'SUB_HWM', 100000 ) )
+        sock.setsockopt( zmq.RCVBUF, self.config.get( 'SUB_RCVBUF', 8 << 20 ) )
+        if self.config.get( 'SUB_CONFLATE' ):
+            # conflating keeps a single message for the whole socket rather
+            # than one per instrument, so other instruments would be lost
+            if len( topics ) > 1:
+                logging.warning( 'SUB_CONFLATE ignored as {n:d} instruments are subscribed, '
+                        'it is only safe with a single one.'.format( n=len( topics ) ) )
+            else:
+                sock.setsockopt( zmq.CONFLATE, 1 )
+
+        # add concerned topics, with many topics a single catch-all
+        # subscription plus filtering by secIds is cheaper than prefix matching
+        subscribeAll = len( topics ) > self.config.get( 'SUBSCRIBE_ALL_THRESHOLD', 20 )
+        if subscribeAll:
+            sock.setsockopt( zmq.SUBSCRIBE, b'' )
+        else:
+            for topic in topics:
+                sock.setsockopt_string( zmq.SUBSCRIBE, topic )
 
         # let's connect to the publisher
         sock.connect( self.config[ 'MQ_SUB_ADDR' ] )
 
+        batchMax = self.config.get( 'BATCH_MAX', 64 )
+        batchSec = self.config.get( 'BATCH_US', 200 ) / 1e6
+
+        # messages are received straight into fixed slots of one scratch
+        # buffer reused across batches, so no frame is allocated per tick
+        slotSize     = self.config.get( 'TICK_MAX_BYTES', 256 )
+        self.scratch = bytearray( batchMax * slotSize )
+        scratchView  = memoryview( self.scratch )
+        slots = [ scratchView[ i * slotSize : ( i + 1 ) * slotSize ]
+                  for i in range( batchMax ) ]
+
+        if hasattr( sock, 'recv_into' ):
+            recvInto = sock.recv_into
+        else:
+            # pyzmq before 26.4, copy the zero-copy frame into the slot
+            def recvInto( slot, flags=0 ):
+                data = sock.recv( flags, copy=False ).buffer
+                size = len( data )
+                n    = min( size, len( slot ) )
+                slot[ : n ] = data[ : n ]
+                return size
+
+        # bind the hot lookups to locals once, outside the receive loop
+        noBlock   = zmq.NOBLOCK
+        again     = zmq.Again
+        now       = time.perf_counter
+        rawSecIds = self.rawSecIds
+        notify    = self.notifyAll
+
         while True:
+            # block for the first message, then drain whatever is queued
+            lengths  = [ recvInto( slots[ 0 ] ) ]
+            deadline = now() + batchSec
+            while len( lengths ) < batchMax and now() < deadline:
+                try:
+                    lengths.append( recvInto( slots[ len( lengths ) ], flags=noBlock ) )
+                except again:
+                    break
+
             # decode raw data
-            raw  = sock.recv().decode( 'utf-8' )
-            cols = [ 'secId', 'tradeDate', 'price' ]
-            instId, tradeDatetime, price = raw.split( ',' )
-            data = [ self.secIds.get( instId, instId ),
-                     dt.datetime.strptime( tradeDatetime, '%Y%m%d %H:%M:%S' ),
-                     float( price ) ]
-
-            if len( data ) == len( cols ):
-                # required data are all available
-                df   = pd.DataFrame( dict( zip( cols, data ) ), index=[ 0 ] )
-                df.set_index( 'secId', inplace=True )
-                self.notifyAll( df )
-            else:
-                logging.warning( 'Received data {rd:s} which is not enough to use.'.format(
-                        rd=raw ) )
+            ids, times, prices = parseBatch( self.scratch, lengths, slotSize,
+                    rawSecIds, subscribeAll )
+
+            if len( ids ) == 1:
+                # a single tick carries plain Python values
+                notify( Tick( ids[ 0 ], times[ 0 ].astype( 'M8[us]' ).item(),
+                              float( prices[ 0 ] ) ) )
+            elif len( ids ) > 1:
+                notify( TickBatch( ids, times, prices ) )
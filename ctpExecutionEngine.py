@@ -29,11 +29,10 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 '''
 
 # built-in modules
+import itertools
 import logging
-import yaml
 
 # third-party modules
-import gevent
 
 # customized modules
 import ctptrader
@@ -73,8 +72,7 @@ raise
 * FileNotFoundError when the given YAML file is not found;
 * KeyError if the required fileds are not specified in the configure file.
         '''
-        with open( configPath, 'r' ) as f:
-            self.config = yaml.load( f.read() )
+        self.config = ctpUtil.loadConfig( configPath )
 
         # login CTP trader API
         ctptrader.login( self.config[ 'TRADER_FRONT_IP' ],
@@ -85,8 +83,8 @@ raise
 
         self.executedOrders = {}
 
-        # next order identifier
-        self.nextId = 1
+        # order identifier generator
+        self.idGen = itertools.count( 1 )
 
         # callbacks
         self.onRspUserLogin   = None
@@ -141,8 +139,7 @@ Returns
 orderId : ctpOrder.CTPOrderId
     identifier of the CTP order;
         '''
-        orderId = self.nextId
-        self.nextId += 1
+        orderId = next( self.idGen )
 
         ctpOrderObj = ctpUtil.convertToCtpOrder( order )
         ctptrader.placeOrder( ctpOrderObj, orderId )
@@ -31,50 +31,106 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 '''
 
 # built-in modules
+import enum
 
 # third-party modules
 
 # customized modules
 import execution.order as eo
 
+
+class Offset( enum.IntEnum ):
+    '''CTP offset flags.
+    '''
+    OPEN  = 48     # ASCII code of '0'
+    CLOSE = 49
+    FORCE_CLOSE = 50
+    CLOSE_TODAY = 51
+    CLOSE_YSTDY = 52
+    FORCE_OFF   = 53
+    LOCAL_FORCE_CLOSE = 54
+
+
+class Direction( enum.IntEnum ):
+    '''CTP direction flags.
+    '''
+    BUY  = 48     # ASCII code of '0'
+    SELL = 49
+
+
+class PriceType( enum.IntEnum ):
+    '''CTP order price types.
+    '''
+    ANY_PRICE   = 49  # ASCII code of '1'
+    LIMIT_PRICE = 50
+    BEST_PRICE  = 51
+
+    LAST_PRICE  = 52
+    LAST_PRICE_PLUS_ONE_TICK   = 53
+    LAST_PRICE_PLUS_TWO_TICK   = 54
+    LAST_PRICE_PLUS_THREE_TICK = 55
+
+    ASK_PRICE1  = 56
+    ASK_PRICE1_PLUS_ONE_TICK   = 57
+    ASK_PRICE1_PLUS_TWO_TICK   = 65
+    ASK_PRICE1_PLUS_THREE_TICK = 66
+
+    BID_PRICE1  = 67
+    BID_PRICE1_PLUS_ONE_TICK   = 68
+    BID_PRICE1_PLUS_TWO_TICK   = 69
+    BID_PRICE1_PLUS_THREE_TICK = 70
+
+
+class SubmitStatus( enum.IntEnum ):
+    '''CTP order submit status.
+    '''
+    SUBMITTED        = 48        # ASCII code of '0'
+    CANCEL_SUBMITTED = 49
+    MODIFY_SUBMITTED = 50
+    ACCEPTED         = 51
+    REJECTED         = 52
+    CANCEL_REJECTED  = 53
+    MODIFY_REJECTED  = 54
+
+
 class CTPOrder( eo.Order ):
     '''An implementation of CTP compatible bullet order.
     '''
 
     # Offset flags
-    OFFSET_OPEN  = 48     # ASCII code of '0'
-    OFFSET_CLOSE = 49
-    OFFSET_FORCE_CLOSE = 50
-    OFFSET_CLOSE_TODAY = 51
-    OFFSET_CLOSE_YSTDY = 52
-    OFFSET_FORCE_OFF   = 53
-    OFFSET_LOCAL_FORCE_CLOSE = 54
+    OFFSET_OPEN  = Offset.OPEN
+    OFFSET_CLOSE = Offset.CLOSE
+    OFFSET_FORCE_CLOSE = Offset.FORCE_CLOSE
+    OFFSET_CLOSE_TODAY = Offset.CLOSE_TODAY
+    OFFSET_CLOSE_YSTDY = Offset.CLOSE_YSTDY
+    OFFSET_FORCE_OFF   = Offset.FORCE_OFF
+    OFFSET_LOCAL_FORCE_CLOSE = Offset.LOCAL_FORCE_CLOSE
 
 
     # Side flags
-    DIRECTION_BUY  = 48     # ASCII code of '0'
-    DIRECTION_SELL = 49
+    DIRECTION_BUY  = Direction.BUY
+    DIRECTION_SELL = Direction.SELL
 
 
     # Price type type
-    PRICE_ANY_PRICE   = 49  # ASCII code of '1'
-    PRICE_LIMIT_PRICE = 50
-    PRICE_BEST_PRICE  = 51
+    PRICE_ANY_PRICE   = PriceType.ANY_PRICE
+    PRICE_LIMIT_PRICE = PriceType.LIMIT_PRICE
+    PRICE_BEST_PRICE  = PriceType.BEST_PRICE
 
-    PRICE_LAST_PRICE  = 52
-    PRICE_LAST_PRICE_PLUS_ONE_TICK   = 53
-    PRICE_LAST_PRICE_PLUS_TWO_TICK   = 54
-    PRICE_LAST_PRICE_PLUS_THREE_TICK = 55
+    PRICE_LAST_PRICE  = PriceType.LAST_PRICE
+    PRICE_LAST_PRICE_PLUS_ONE_TICK   = PriceType.LAST_PRICE_PLUS_ONE_TICK
+    PRICE_LAST_PRICE_PLUS_TWO_TICK   = PriceType.LAST_PRICE_PLUS_TWO_TICK
+    PRICE_LAST_PRICE_PLUS_THREE_TICK = PriceType.LAST_PRICE_PLUS_THREE_TICK
 
-    PRICE_ASK_PRICE1  = 56
-    PRICE_ASK_PRICE1_PLUS_ONE_TICK   = 57
-    PRICE_ASK_PRICE1_PLUS_TWO_TICK   = 65
-    PRICE_ASK_PRICE1_PLUS_THREE_TICK = 66
+    PRICE_ASK_PRICE1  = PriceType.ASK_PRICE1
+    PRICE_ASK_PRICE1_PLUS_ONE_TICK   = PriceType.ASK_PRICE1_PLUS_ONE_TICK
+    PRICE_ASK_PRICE1_PLUS_TWO_TICK   = PriceType.ASK_PRICE1_PLUS_TWO_TICK
+    PRICE_ASK_PRICE1_PLUS_THREE_TICK = PriceType.ASK_PRICE1_PLUS_THREE_TICK
 
-    PRICE_BID_PRICE1  = 67
-    PRICE_BID_PRICE1_PLUS_ONE_TICK   = 68
-    PRICE_BID_PRICE1_PLUS_TWO_TICK   = 69
-    PRICE_BID_PRICE1_PLUS_THREE_TICK = 70
+    PRICE_BID_PRICE1  = PriceType.BID_PRICE1
+    PRICE_BID_PRICE1_PLUS_ONE_TICK   = PriceType.BID_PRICE1_PLUS_ONE_TICK
+    PRICE_BID_PRICE1_PLUS_TWO_TICK   = PriceType.BID_PRICE1_PLUS_TWO_TICK
+    PRICE_BID_PRICE1_PLUS_THREE_TICK = PriceType.BID_PRICE1_PLUS_THREE_TICK
 
 
     def __init__( self, instId, exch, side, volume, priceType, price,
@@ -89,13 +145,13 @@ class CTPOrder( eo.Order ):
 class CTPOrderStatus( eo.OrderStatus ):
     '''An implementation of CTP compatible order status.
     '''
-    ORDER_SUBMITTED        = 48        # ASCII code of '0'
-    ORDER_CANCEL_SUBMITTED = 49
-    ORDER_MODIFY_SUBMITTED = 50
-    ORDER_ACCEPTED         = 51
-    ORDER_REJECTED         = 52
-    ORDER_CANCEL_REJECTED  = 53
-    ORDER_MODIFY_REJECTED  = 54
+    ORDER_SUBMITTED        = SubmitStatus.SUBMITTED
+    ORDER_CANCEL_SUBMITTED = SubmitStatus.CANCEL_SUBMITTED
+    ORDER_MODIFY_SUBMITTED = SubmitStatus.MODIFY_SUBMITTED
+    ORDER_ACCEPTED         = SubmitStatus.ACCEPTED
+    ORDER_REJECTED         = SubmitStatus.REJECTED
+    ORDER_CANCEL_REJECTED  = SubmitStatus.CANCEL_REJECTED
+    ORDER_MODIFY_REJECTED  = SubmitStatus.MODIFY_REJECTED
 
     def __init__( self, sessionId, status ):
         '''Initialize order status.
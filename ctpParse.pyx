@@ -0,0 +1,273 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+
+'''Compiled tick parser for the CTP data publisher.
+
+Build in place with ``cythonize -i ctpParse.pyx``; the publisher falls back to
+ctpUtil.parseBatch when the extension is not available. Both parsers accept
+and reject exactly the same messages, see ctpUtil.parseBatch.
+'''
+
+'''
+Copyright (c) 2017, WinQuant Information and Technology Co. Ltd.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the <organization> nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL <COPYRIGHT HOLDER> BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+'''
+
+# built-in modules
+import logging
+from libc.stdint cimport int64_t
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
+# third-party modules
+import numpy as np
+
+cdef enum:
+    # length of the fixed YYYYMMDD HH:MM:SS timestamp
+    TIME_LEN = 17
+    # trade years representable as datetime64[ns]
+    MIN_TRADE_YEAR = 1678
+    MAX_TRADE_YEAR = 2261
+
+cdef int64_t NS_PER_SEC = 1000000000
+
+# largest mantissa and power of ten that are exact doubles, so that their
+# quotient is correctly rounded like float()
+cdef int64_t MAX_EXACT_MANTISSA = 1 << 53
+cdef double POW10[ 23 ]
+POW10[ 0 ] = 1.0
+for _i in range( 1, 23 ):
+    POW10[ _i ] = POW10[ _i - 1 ] * 10.0
+
+# days of each month in a common year
+cdef int MONTH_DAYS[ 12 ]
+MONTH_DAYS[ : ] = [ 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31 ]
+
+
+cdef inline int64_t _daysFromCivil( int64_t y, int64_t m, int64_t d ) nogil:
+    '''Days since 1970-01-01 of the given proleptic Gregorian date.
+    '''
+    cdef int64_t era, yoe, doy, doe
+    if m <= 2:
+        y -= 1
+    era = ( y if y >= 0 else y - 399 ) // 400
+    yoe = y - era * 400
+    doy = ( 153 * ( m - 3 if m > 2 else m + 9 ) + 2 ) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+cdef inline int64_t _digits( const unsigned char *p, int n ) nogil:
+    '''Integer value of n ASCII digits, -1 if any is not a digit.
+    '''
+    cdef int64_t v = 0
+    cdef int i
+    cdef unsigned char c
+    for i in range( n ):
+        c = p[ i ] - 48
+        if c > 9:
+            return -1
+        v = v * 10 + c
+    return v
+
+
+cdef inline int _daysInMonth( int64_t y, int64_t m ) nogil:
+    '''Number of days in the given month.
+    '''
+    if m == 2 and y % 4 == 0 and ( y % 100 != 0 or y % 400 == 0 ):
+        return 29
+    return MONTH_DAYS[ m - 1 ]
+
+
+cdef inline bint _parseTime( const unsigned char *p, int64_t *out ) nogil:
+    '''Parse a YYYYMMDD HH:MM:SS timestamp into nanoseconds since epoch.
+
+Timestamps before the epoch are negative. Returns False if the timestamp is
+malformed.
+    '''
+    cdef int64_t year, month, day, hour, minute, second
+    if p[ 8 ] != 32 or p[ 11 ] != 58 or p[ 14 ] != 58:
+        return False
+    year   = _digits( p, 4 )
+    month  = _digits( p + 4, 2 )
+    day    = _digits( p + 6, 2 )
+    hour   = _digits( p + 9, 2 )
+    minute = _digits( p + 12, 2 )
+    second = _digits( p + 15, 2 )
+    if year < MIN_TRADE_YEAR or year > MAX_TRADE_YEAR or \
+            month < 1 or month > 12 or day < 1 or \
+            day > _daysInMonth( year, month ) or \
+            hour < 0 or hour > 23 or minute < 0 or minute > 59 or \
+            second < 0 or second > 59:
+        return False
+
+    out[ 0 ] = ( ( _daysFromCivil( year, month, day ) * 24 + hour ) * 60 + minute ) \
+            * 60 * NS_PER_SEC + second * NS_PER_SEC
+    return True
+
+
+cdef inline bint _parsePrice( const unsigned char *p, Py_ssize_t n, double *out ):
+    '''Parse an optionally signed decimal price without exponent.
+
+Only ASCII digits and at most one decimal point are accepted, regardless of
+the C locale. Returns False if the price is malformed.
+    '''
+    cdef Py_ssize_t i = 0
+    cdef int64_t mantissa = 0
+    cdef int digits = 0, fraction = 0
+    cdef bint negative = False, dot = False, exact = True
+    cdef unsigned char c
+
+    if n > 0 and ( p[ 0 ] == 43 or p[ 0 ] == 45 ):
+        negative = p[ 0 ] == 45
+        i = 1
+
+    while i < n:
+        c = p[ i ]
+        if c == 46:
+            if dot:
+                return False
+            dot = True
+        elif 48 <= c <= 57:
+            digits += 1
+            if exact and mantissa <= ( MAX_EXACT_MANTISSA - 9 ) // 10:
+                mantissa = mantissa * 10 + ( c - 48 )
+                if dot:
+                    fraction += 1
+            else:
+                exact = False
+        else:
+            return False
+        i += 1
+
+    if digits == 0:
+        return False
+
+    if exact and fraction < 23:
+        out[ 0 ] = -( mantissa / POW10[ fraction ] ) if negative \
+                else mantissa / POW10[ fraction ]
+    else:
+        # too many significant digits for the exact path, rare
+        out[ 0 ] = float( PyBytes_FromStringAndSize( <const char *> p, n ) )
+    return True
+
+
+cpdef parseBatch( scratch, list lengths, Py_ssize_t slotSize, dict secIds,
+        bint dropUnknown=False ):
+    '''Parse a batch of raw ticks in the format instId,YYYYMMDD HH:MM:SS,price.
+
+Parameters
+----------
+scratch : bytes-like
+    receive buffer holding the i-th message at offset i * slotSize;
+lengths : list of int
+    length of each received message, messages longer than slotSize were
+    truncated on receive and are skipped;
+slotSize : int
+    size of each message slot in the scratch buffer;
+secIds : dict
+    mapping from raw CTP instrument ID bytes to securities identifiers;
+dropUnknown : bool
+    skip ticks whose instrument ID is not in secIds, otherwise the decoded
+    instrument ID is used as the securities identifier.
+
+Returns
+-------
+secIds : numpy.ndarray of object
+    securities identifiers;
+tradeDates : numpy.ndarray of datetime64[ns]
+    trade timestamps;
+prices : numpy.ndarray of float64
+    last prices.
+    '''
+    cdef Py_ssize_t n = len( lengths )
+    cdef Py_ssize_t i, j, size, c1, c2, count = 0
+    cdef const unsigned char[ : ] buf = scratch
+    cdef const unsigned char *p
+    cdef int64_t ns = 0
+    cdef double price = 0.0
+    cdef object[ : ] ids
+    cdef int64_t[ : ] times
+    cdef double[ : ] prices
+
+    idsArr    = np.empty( n, dtype=object )
+    timesArr  = np.empty( n, dtype=np.int64 )
+    pricesArr = np.empty( n, dtype=np.float64 )
+    ids    = idsArr
+    times  = timesArr
+    prices = pricesArr
+
+    if n * slotSize > buf.shape[ 0 ]:
+        raise ValueError( 'Scratch buffer is smaller than the batch.' )
+
+    for i in range( n ):
+        size = lengths[ i ]
+        if size > slotSize:
+            logging.warning( 'Received data of {n:d} bytes which is truncated.'.format(
+                    n=size ) )
+            continue
+        p = &buf[ i * slotSize ]
+
+        # locate the two field separators
+        c1 = -1
+        c2 = -1
+        for j in range( size ):
+            if p[ j ] == 44:
+                if c1 < 0:
+                    c1 = j
+                elif c2 < 0:
+                    c2 = j
+                else:
+                    c2 = -1
+                    break
+
+        if c2 < 0:
+            logging.warning( 'Received data {rd:s} which is not enough to use.'.format(
+                    rd=PyBytes_FromStringAndSize( <const char *> p, size ).decode( 'utf-8', 'replace' ) ) )
+            continue
+
+        if c2 - c1 - 1 != TIME_LEN or not _parseTime( p + c1 + 1, &ns ) or \
+                not _parsePrice( p + c2 + 1, size - c2 - 1, &price ):
+            logging.warning( 'Received data {rd:s} which is malformed.'.format(
+                    rd=PyBytes_FromStringAndSize( <const char *> p, size ).decode( 'utf-8', 'replace' ) ) )
+            continue
+
+        instId = PyBytes_FromStringAndSize( <const char *> p, c1 )
+        secId  = secIds.get( instId )
+        if secId is None:
+            if dropUnknown:
+                # not a concerned topic
+                continue
+            try:
+                secId = instId.decode( 'ascii' )
+            except UnicodeDecodeError:
+                logging.warning( 'Received data {rd:s} which is malformed.'.format(
+                        rd=PyBytes_FromStringAndSize( <const char *> p, size ).decode( 'utf-8', 'replace' ) ) )
+                continue
+
+        ids[ count ]    = secId
+        times[ count ]  = ns
+        prices[ count ] = price
+        count += 1
+
+    return idsArr[ : count ], timesArr[ : count ].view( 'M8[ns]' ), pricesArr[ : count ]
@@ -31,14 +31,67 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 '''
 
 # built-in modules
+import datetime as dt
+import functools
+import logging
+import re
 
 # third-party modules
+import yaml
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
 
 # customized modules
 import ctpOrder
+import execution.order as eo
+
+# bullet order side to CTP direction, anything but buy is a sell
+_SIDE = { eo.Order.BUY: ctpOrder.CTPOrder.DIRECTION_BUY }
+
+# bullet order offset to CTP offset flag, open a new contract by default
+_OFFSET = { eo.Order.CLOSE: ctpOrder.CTPOrder.OFFSET_CLOSE,
+            eo.Order.CLOSE_TODAY: ctpOrder.CTPOrder.OFFSET_CLOSE_TODAY }
+
+# extreme limit price adjustment on market orders per CTP direction
+_MARKET_PRICE_ADJ = { ctpOrder.CTPOrder.DIRECTION_BUY: 100,
+                      ctpOrder.CTPOrder.DIRECTION_SELL: -100 }
+
+@functools.lru_cache( maxsize=8 )
+def _loadConfig( configPath ):
+    '''Parse the YAML configure file, cached per path.
+    '''
+    with open( configPath, 'r' ) as f:
+        return yaml.load( f, Loader=YAMLLoader )
+
+
+def loadConfig( configPath ):
+    '''Load the YAML configure file of the CTP driver.
+
+The file is only parsed the first time a given path is loaded, with the
+libyaml safe loader when available.
+
+Parameters
+----------
+configPath : str
+    path to the YAML configure file.
+
+Returns
+-------
+config : dict
+    configure items, a fresh copy per call.
+
+Exceptions
+----------
+raise FileNotFoundError when the given YAML file is not found.
+    '''
+    return dict( _loadConfig( configPath ) )
 
-def getCtpInstId( secId ):
-    '''Get CTP instrument ID of the given securities.
+
+@functools.lru_cache( maxsize=4096 )
+def _parseSecId( secId ):
+    '''Split the securities identifier into CTP instrument ID and exchange.
 
 Parameters
 ----------
@@ -48,7 +101,9 @@ secId : str
 Returns
 -------
 ctpInstId : str
-    instrument identifier of the given securities identifier.
+    instrument identifier of the given securities identifier;
+ctpExch : str
+    exchange identifier of the given securities.
     '''
     instId, exch = secId.split( '.' )
 
@@ -59,7 +114,25 @@ ctpInstId : str
     else:
         instId = instId.lower()
 
-    return instId
+    ctpExch = exch[ 1 ] if len( exch ) > 1 else ''
+
+    return instId, ctpExch
+
+
+def getCtpInstId( secId ):
+    '''Get CTP instrument ID of the given securities.
+
+Parameters
+----------
+secId : str
+    Securities identifier.
+
+Returns
+-------
+ctpInstId : str
+    instrument identifier of the given securities identifier.
+    '''
+    return _parseSecId( secId )[ 0 ]
 
 
 def getCtpExch( secId ):
@@ -75,10 +148,149 @@ Returns
 ctpExch : str
     exchange identifier of the given securities.
     '''
-    secIdCmp = secId.split( '.' )[ 1 ]
-    ctpExch  = secIdCmp[ 1 ] if len( secIdCmp ) > 1 else ''
+    return _parseSecId( secId )[ 1 ]
+
+
+# layout of the tick fields shared with ctpParse.pyx: the timestamp is
+# exactly YYYYMMDD HH:MM:SS in ASCII digits, the price is an optional sign
+# and ASCII digits with at most one decimal point, without exponent,
+# blanks or underscores
+_TRADE_DATETIME   = re.compile( '[0-9]{8} [0-9]{2}:[0-9]{2}:[0-9]{2}' )
+_TRADE_DATETIME_B = re.compile( rb'[0-9]{8} [0-9]{2}:[0-9]{2}:[0-9]{2}' )
+_PRICE_B = re.compile( rb'[+-]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)' )
+
+# trade years representable as datetime64[ns]
+_MIN_TRADE_YEAR = 1678
+_MAX_TRADE_YEAR = 2261
+
+
+@functools.lru_cache( maxsize=16 )
+def _getTradeDay( tradeDay ):
+    '''Split the YYYYMMDD trade day into integer year, month and day.
+    '''
+    return int( tradeDay[ 0 : 4 ] ), int( tradeDay[ 4 : 6 ] ), int( tradeDay[ 6 : 8 ] )
+
+
+def parseTradeDatetime( tradeDatetime ):
+    '''Parse the trade timestamp sent by the CTP bridge.
+
+The layout is fixed as YYYYMMDD HH:MM:SS in ASCII digits, so the fields are
+sliced directly instead of going through datetime.strptime. The day part is
+cached as most ticks share the same trading day. Years outside 1678 to 2261,
+which do not fit in datetime64[ns], are rejected.
+
+Parameters
+----------
+tradeDatetime : str or bytes
+    trade timestamp in the format YYYYMMDD HH:MM:SS.
+
+Returns
+-------
+tradeDate : datetime.datetime
+    the parsed trade timestamp.
+
+Exceptions
+----------
+raise ValueError if the timestamp is malformed.
+    '''
+    layout = _TRADE_DATETIME_B if isinstance( tradeDatetime, bytes ) else _TRADE_DATETIME
+    if layout.fullmatch( tradeDatetime ) is None:
+        raise ValueError( 'Malformed trade timestamp {t!r}.'.format( t=tradeDatetime ) )
 
-    return ctpExch
+    year, month, day = _getTradeDay( tradeDatetime[ 0 : 8 ] )
+    if not _MIN_TRADE_YEAR <= year <= _MAX_TRADE_YEAR:
+        raise ValueError( 'Trade year {y:d} is out of range.'.format( y=year ) )
+
+    return dt.datetime( year, month, day, int( tradeDatetime[ 9 : 11 ] ),
+            int( tradeDatetime[ 12 : 14 ] ), int( tradeDatetime[ 15 : 17 ] ) )
+
+
+def parseBatch( scratch, lengths, slotSize, secIds, dropUnknown=False ):
+    '''Parse a batch of raw ticks in the format instId,YYYYMMDD HH:MM:SS,price.
+
+This is the pure Python counterpart of ctpParse.parseBatch, used when the
+compiled extension is not available. Both follow the same rules: a message
+without exactly three comma separated fields is not enough to use, and a
+message whose timestamp or price does not follow the layout of
+parseTradeDatetime and _PRICE_B is malformed; both are skipped with a
+warning. Both return the same column types.
+
+Parameters
+----------
+scratch : bytes-like
+    receive buffer holding the i-th message at offset i * slotSize;
+lengths : list of int
+    length of each received message, messages longer than slotSize were
+    truncated on receive and are skipped;
+slotSize : int
+    size of each message slot in the scratch buffer;
+secIds : dict
+    mapping from raw CTP instrument ID bytes to securities identifiers;
+dropUnknown : bool
+    skip ticks whose instrument ID is not in secIds, otherwise the decoded
+    instrument ID is used as the securities identifier.
+
+Returns
+-------
+secIds : numpy.ndarray of object
+    securities identifiers;
+tradeDates : numpy.ndarray of datetime64[ns]
+    trade timestamps;
+prices : numpy.ndarray of float64
+    last prices.
+    '''
+    # numpy is only loaded by the market data receiver
+    import numpy as np
+
+    getSecId = secIds.get
+    view     = memoryview( scratch )
+    ids, times, prices = [], [], []
+    for i, size in enumerate( lengths ):
+        if size > slotSize:
+            logging.warning( 'Received data of {n:d} bytes which is truncated.'.format(
+                    n=size ) )
+            continue
+
+        # tick data are plain ASCII, the instrument ID is only decoded
+        # when it is not a known topic
+        offset = i * slotSize
+        raw    = bytes( view[ offset : offset + size ] )
+        fields = raw.split( b',' )
+
+        if len( fields ) != 3:
+            logging.warning( 'Received data {rd:s} which is not enough to use.'.format(
+                    rd=raw.decode( 'utf-8', 'replace' ) ) )
+            continue
+
+        instId, tradeDatetime, price = fields
+        try:
+            if _PRICE_B.fullmatch( price ) is None:
+                raise ValueError( 'Malformed price.' )
+            tradeDate = parseTradeDatetime( tradeDatetime )
+            price     = float( price )
+        except ValueError:
+            logging.warning( 'Received data {rd:s} which is malformed.'.format(
+                    rd=raw.decode( 'utf-8', 'replace' ) ) )
+            continue
+
+        secId = getSecId( instId )
+        if secId is None:
+            if dropUnknown:
+                # not a concerned topic
+                continue
+            try:
+                secId = instId.decode( 'ascii' )
+            except UnicodeDecodeError:
+                logging.warning( 'Received data {rd:s} which is malformed.'.format(
+                        rd=raw.decode( 'utf-8', 'replace' ) ) )
+                continue
+
+        ids.append( secId )
+        times.append( tradeDate )
+        prices.append( price )
+
+    return np.array( ids, dtype=object ), np.array( times, dtype='M8[ns]' ), \
+            np.array( prices, dtype=np.float64 )
 
 
 def convertToCtpOrder( order ):
@@ -94,24 +306,17 @@ Returns
 ctpOrder : ctpOrder.CTPOrder
     CTP order.
     '''
-    instId = getCtpInstId( order.secId )
-    exch   = getCtpExch( order.secId )
-    side   = ctpOrder.CTPOrder.DIRECTION_BUY if order.side == order.BUY \
-                    else ctpOrder.CTPOrder.DIRECTION_SELL
+    instId, exch = _parseSecId( order.secId )
+    side   = _SIDE.get( order.side, ctpOrder.CTPOrder.DIRECTION_SELL )
     volume = order.volume
     price  = order.price
     # adjust to use market price
     if order.priceType == order.MARKET_ORDER:
         # in case some client does not support market order,
         # force market order with extreme limit price manually
-        price  = price + 100 if side == ctpOrder.CTPOrder.DIRECTION_BUY else max( 1, price - 100 )
-
-    # open a new contract by default
-    offset = ctpOrder.CTPOrder.OFFSET_OPEN
-    if order.offset == order.CLOSE:
-        offset = ctpOrder.CTPOrder.OFFSET_CLOSE
-    elif order.offset == order.CLOSE_TODAY:
-        offset = ctpOrder.CTPOrder.OFFSET_CLOSE_TODAY
+        price  = max( 1, price + _MARKET_PRICE_ADJ[ side ] )
+
+    offset = _OFFSET.get( order.offset, ctpOrder.CTPOrder.OFFSET_OPEN )
 
     # set ask price 1 for buy order, and take bid price 1 for sell order
     priceType = ctpOrder.CTPOrder.PRICE_LIMIT_PRICE
@@ -0,0 +1,44 @@
+'''Test fixtures of the CTP driver.
+
+The CTP gateway bindings and the arsenal framework are not needed to test the
+pure Python parts of the driver, so minimal stand-ins are installed when the
+real modules cannot be imported.
+'''
+
+# built-in modules
+import os
+import sys
+import types
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+if ROOT not in sys.path:
+    sys.path.insert( 0, ROOT )
+
+
+def _install( name, **attrs ):
+    '''Install a stand-in module unless the real one can be imported.
+    '''
+    try:
+        __import__( name )
+    except ImportError:
+        module = types.ModuleType( name )
+        module.__dict__.update( attrs )
+        sys.modules[ name ] = module
+        parent, _, child = name.rpartition( '.' )
+        if parent:
+            setattr( sys.modules[ parent ], child, module )
+
+
+class _Order( object ):
+    BUY, SELL = 1, 2
+    OPEN, CLOSE, CLOSE_TODAY = 1, 2, 3
+    MARKET_ORDER, LIMIT_ORDER = 1, 2
+
+
+_noop = lambda *args: None
+
+_install( 'datafeed' )
+_install( 'datafeed.engine', DataPublisher=object )
+_install( 'execution' )
+_install( 'execution.order', Order=_Order, OrderStatus=object, OrderId=object )
+_install( 'ctpmd', login=_noop, connect=_noop, subscribeMarketData=_noop )
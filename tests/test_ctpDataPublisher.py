@@ -0,0 +1,145 @@
+'''Tests of the delivery of ticks to the subscribers.
+'''
+
+# built-in modules
+import os
+import threading
+
+# third-party modules
+import numpy as np
+
+# customized modules
+import ctpDataPublisher as cdp
+
+CONFIG = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ),
+        'config.yaml' )
+
+
+class Subscriber( object ):
+    '''Subscriber recording what is delivered to it.
+    '''
+    def __init__( self, topics, wantsRawTick=False, expected=1 ):
+        self.topics = topics
+        self.wantsRawTick = wantsRawTick
+        self.received = []
+        self.remaining = expected
+        self.done = threading.Event()
+
+    def getSubscribedTopics( self ):
+        return self.topics
+
+    def getSubscribedDataFields( self ):
+        return None
+
+    def _receive( self, data ):
+        self.received.append( data )
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.done.set()
+
+    onData = _receive
+    onTick = _receive
+
+
+def _mixedBatch():
+    secIds = [ 'IF1706.CCFX' ] * 5 + [ 'ag1706.XSGE' ] + [ 'IF1706.CCFX' ] * 5 + \
+            [ 'rb1710.XSGE' ]
+    return cdp.TickBatch( np.array( secIds, dtype=object ),
+            np.arange( len( secIds ) ).astype( 'M8[s]' ).astype( 'M8[ns]' ),
+            np.arange( len( secIds ), dtype=np.float64 ) )
+
+
+def _deliver( data, subscribers ):
+    publisher = cdp.CTPDataPublisher( CONFIG )
+    for s in subscribers:
+        publisher.addSubscriber( s )
+    publisher.notifyAll( data )
+    for s in subscribers:
+        assert s.done.wait( 5 )
+
+
+def test_mixedBatchOnlyDeliversSubscribedRows():
+    batch = _mixedBatch()
+    ag    = Subscriber( [ 'ag1706.XSGE' ] )
+    rawAg = Subscriber( [ 'ag1706.XSGE' ], wantsRawTick=True )
+    both  = Subscriber( [ 'IF1706.CCFX', 'rb1710.XSGE' ] )
+    everything = Subscriber( [ 'IF1706.CCFX', 'ag1706.XSGE', 'rb1710.XSGE' ],
+            wantsRawTick=True )
+    _deliver( batch, [ ag, rawAg, both, everything ] )
+
+    df, = ag.received
+    assert list( df.index ) == [ 'ag1706.XSGE' ]
+    assert list( df.price ) == [ 5.0 ]
+
+    tb, = rawAg.received
+    assert isinstance( tb, cdp.TickBatch )
+    assert list( tb.secIds ) == [ 'ag1706.XSGE' ]
+    assert list( tb.prices ) == [ 5.0 ]
+
+    # rows of several topics keep the order received
+    df, = both.received
+    assert list( df.index ) == [ 'IF1706.CCFX' ] * 10 + [ 'rb1710.XSGE' ]
+    assert list( df.price ) == [ 0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11 ]
+
+    tb, = everything.received
+    assert tb is batch
+
+
+def test_framesAreBuiltOnceOffTheCallingThread( monkeypatch ):
+    builders = []
+    toFrame  = cdp.TickBatch.toFrame
+    def recordingToFrame( self ):
+        builders.append( threading.current_thread() )
+        return toFrame( self )
+    monkeypatch.setattr( cdp.TickBatch, 'toFrame', recordingToFrame )
+
+    batch = _mixedBatch()
+    first  = Subscriber( [ 'IF1706.CCFX', 'ag1706.XSGE', 'rb1710.XSGE' ] )
+    second = Subscriber( [ 'IF1706.CCFX', 'ag1706.XSGE', 'rb1710.XSGE' ] )
+    _deliver( batch, [ first, second ] )
+
+    assert first.received[ 0 ] is second.received[ 0 ]
+    assert len( builders ) == 1
+    assert builders[ 0 ] is not threading.current_thread()
+
+
+def test_mixedFrameOnlyDeliversSubscribedRows():
+    frame = _mixedBatch().toFrame()
+    ag    = Subscriber( [ 'ag1706.XSGE' ] )
+    rb    = Subscriber( [ 'rb1710.XSGE' ], wantsRawTick=True )
+    _deliver( frame, [ ag, rb ] )
+
+    df, = ag.received
+    assert list( df.index ) == [ 'ag1706.XSGE' ]
+    assert list( df.price ) == [ 5.0 ]
+
+    df, = rb.received
+    assert list( df.index ) == [ 'rb1710.XSGE' ]
+    assert list( df.price ) == [ 11.0 ]
+
+
+def _extend( ring, start, n ):
+    values = np.arange( start, start + n )
+    ring.extend( values.astype( str ).astype( object ), values.astype( 'M8[ns]' ),
+            values.astype( np.float64 ) )
+
+
+def test_tickRingSnapshotIsNotOverwritten():
+    ring = cdp.TickRing( 8 )
+    _extend( ring, 0, 6 )
+    df = ring.snapshot( 4 )
+    _extend( ring, 6, 8 )
+    assert list( df.price ) == [ 2, 3, 4, 5 ]
+    assert list( df.index ) == [ '2', '3', '4', '5' ]
+
+    df = ring.snapshot()
+    assert list( df.price ) == list( range( 6, 14 ) )
+
+
+def test_tickRingSnapshotDropsRowsBeingWritten():
+    ring = cdp.TickRing( 8 )
+    _extend( ring, 0, 8 )
+    # the writer announced 3 more ticks, overwriting the 3 oldest slots
+    ring.reserved += 3
+    df = ring.snapshot()
+    assert list( df.price ) == list( range( 3, 8 ) )
@@ -0,0 +1,92 @@
+'''Tests of the tick parsers, the compiled one must agree with ctpUtil.
+'''
+
+# built-in modules
+import logging
+
+# third-party modules
+import numpy as np
+import pytest
+
+# customized modules
+import ctpUtil
+
+SECIDS = { b'rb1705': 'rb1705.XSGE' }
+
+MESSAGES = [ b'', b'a', b'a,b', b'a,b,c,d',
+        b'rb1705,20170103 09:30:01,3345.5',
+        b'x,20170103 09:30:01,+.5',
+        b'x,20170103 09:30:01,-1.',
+        b'x,20170103 09:30:01,9007199254740993',
+        b'x,20170103 09:30:01,0.1000000000000000000000001',
+        b'x,20000229 23:59:59,1',
+        # timestamps before the epoch
+        b'ag1706,19691231 23:59:59,1.5',
+        b'x,19000101 00:00:00,1',
+        # the range of datetime64[ns]
+        b'x,16780101 00:00:00,1',
+        b'x,22611231 23:59:59,1',
+        b'x,16771231 23:59:59,1',
+        b'x,22620101 00:00:00,1',
+        # malformed
+        b'x,20170103 9:30:01,1',
+        b'x,20170103T09:30:01,1',
+        b'x,20170103 24:00:00,1',
+        b'x,20170229 09:30:01,1',
+        b'x,20170103 09:30:01, 12 ',
+        b'x,20170103 09:30:01,1e3',
+        b'x,20170103 09:30:01,nan',
+        b'x,20170103 09:30:01,.',
+        b'x,\xd9\xa10170103 09:30:01,1',
+        b'\xc3\xa9x,20170103 09:30:01,1',
+        b'\xffrb1705,20170103 09:30:01,1',
+        b'x,20170103 09:30:01,' + b'1' * 80 ]
+
+
+def _parse( parseBatch, messages, slotSize=96 ):
+    '''Parse the messages laid out like the receiver does, with the warnings.
+    '''
+    scratch = bytearray( slotSize * len( messages ) )
+    lengths = []
+    for i, m in enumerate( messages ):
+        scratch[ i * slotSize : i * slotSize + min( len( m ), slotSize ) ] = m[ : slotSize ]
+        lengths.append( len( m ) )
+
+    warnings = []
+    class Handler( logging.Handler ):
+        def emit( self, record ):
+            warnings.append( record.getMessage() )
+
+    handler = Handler( logging.WARNING )
+    logging.getLogger().addHandler( handler )
+    try:
+        result = parseBatch( scratch, lengths, slotSize, SECIDS )
+    finally:
+        logging.getLogger().removeHandler( handler )
+
+    return [ list( col ) for col in result ], warnings
+
+
+def test_preEpochTimestampsAreAccepted():
+    ( ids, times, prices ), warnings = _parse( ctpUtil.parseBatch,
+            [ b'ag1706,19691231 23:59:59,1.5', b'x,16780101 00:00:00,2' ] )
+    assert warnings == []
+    assert ids == [ 'ag1706', 'x' ]
+    assert times == [ np.datetime64( '1969-12-31T23:59:59', 'ns' ),
+                      np.datetime64( '1678-01-01T00:00:00', 'ns' ) ]
+    assert prices == [ 1.5, 2.0 ]
+
+
+def test_nonAsciiInstrumentIsSkipped():
+    ( ids, _, prices ), warnings = _parse( ctpUtil.parseBatch,
+            [ b'\xc3\xa9x,20170103 09:30:01,1', b'rb1705,20170103 09:30:01,2' ] )
+    assert ids == [ 'rb1705.XSGE' ]
+    assert prices == [ 2.0 ]
+    assert len( warnings ) == 1 and 'malformed' in warnings[ 0 ]
+
+
+@pytest.mark.parametrize( 'message', MESSAGES )
+def test_compiledParserAgrees( message ):
+    ctpParse = pytest.importorskip( 'ctpParse' )
+    assert _parse( ctpParse.parseBatch, [ message ] ) == \
+            _parse( ctpUtil.parseBatch, [ message ] )